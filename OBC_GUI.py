@@ -9,6 +9,7 @@ ConfigWindow() is called to prompt for configuration.
 MainWindow() is called to create the main window.
 
 LogAddMsg() and ZephyrAddMsg() are called to add messages to the log and Zephyr message displays.
+FlushDisplayBuffers() is called once per main loop pass to print the added messages.
 
 PollWindowEvents() is called from the main program loop to poll the main window for events.
 
@@ -19,14 +20,14 @@ parameters are returned to the main program as a dictionary.
 
 # modules
 import os
+import re
 import sys
+import functools
+import itertools
 import ast
 import json
-import queue
+import collections
 import serial
-import serial.tools.list_ports
-import xmltodict
-import pyperclip
 import PySimpleGUIQt as sg
 import OBC_Sim_Generic
 
@@ -38,6 +39,13 @@ ZephyrMessagesNoParams = [
     ('TMAck', 'Send a TM Ack')
 ]
 
+# Zephyr acks, their senders, and their debug window labels
+ZephyrAcks = {
+    'SAck':  (OBC_Sim_Generic.sendSAck,  'safety ack'),
+    'RAAck': (OBC_Sim_Generic.sendRAAck, 'RAA ack'),
+    'TMAck': (OBC_Sim_Generic.sendTMAck, 'TM ack')
+}
+
 # Instrument modes, and their tooltips
 ZephyrInstModes = [
     ('SB','Standby Mode'),
@@ -46,12 +54,33 @@ ZephyrInstModes = [
     ('SA','Safety Mode'),
     ('EF','End of Flight Mode')]
 
+# Tokens which determine the color of a message in the Zephyr window, and the
+# color rules in priority order. A rule applies when all of its tokens are present.
+# The lookahead reports overlapping tokens too, e.g. both CRIT and TM in 'CRITM'
+ZephyrColorTokens = re.compile(r'(?=(\(TO\)|TM|CRIT|WARN))')
+ZephyrColorRules = [
+    ({'(TO)'},       'blue'),
+    ({'TM', 'CRIT'}, 'red'),
+    ({'TM', 'WARN'}, 'orange'),
+    ({'TM'},         'green')]
+
+# A plain decimal SZA value. float() alone would also accept 'nan' and 'inf'.
+SZAFormat = re.compile(r'[-+]?(\d+\.?\d*|\.\d+)')
+
 # set global variables
 main_window = None
+log_display = None
+zephyr_display = None
+suspend_button = None
+tc_input = None
+gps_input = None
+tm_dir_input = None
+tm_dir = ''
 xml_queue = None
 new_window = True
 log_port = None
 zephyr_port = None
+shared_ports = False
 cmd_filename = ''
 instrument = ''
 serial_suspended = False
@@ -61,12 +90,45 @@ active_config_set = None
 # and the number of lines to keep when the maximum is reached
 MAXLOGLINES = 2000
 KEEPLOGLINES = 1600
+# the maximum number of Zephyr messages held back while the main window is minimized
+MAXZEPHYRBUFFER = 2000
 
 log_line_count = 0
+# The last KEEPLOGLINES log messages, as (text, color) tuples. When the log display
+# is full it is redrawn from here, instead of reading back and splitting its contents.
+log_lines = collections.deque(maxlen=KEEPLOGLINES)
+
+# The main window read timeout backs off from MINPOLLTIMEOUT to MAXPOLLTIMEOUT ms
+# while the window is idle, and is reset by any event
+MINPOLLTIMEOUT = 10
+MAXPOLLTIMEOUT = 100
+# There is no serial traffic while suspended, so the window is read less often
+SUSPENDEDPOLLTIMEOUT = 500
+idle_poll_count = 0
+poll_timeout = MINPOLLTIMEOUT
+
+# Messages waiting to be printed to the log and Zephyr displays, as (text, color) tuples.
+# They are printed once per main loop pass by FlushDisplayBuffers().
+log_display_buffer = []
+zephyr_display_buffer = []
+# Debug window messages waiting to be printed, as (text, error) tuples. Each sg.Print()
+# also services the debug window's events, so they are printed once per pass as well.
+debug_display_buffer = []
 message_display_types = ['TM', 'TC', 'IM', 'TMAck', 'GPS', 'TCAck', 'IMAck', 'IMR']
 message_display_filters = {msg_type: True for msg_type in message_display_types}
 display_toggle_keys = {msg_type: f'-display-{msg_type}-' for msg_type in message_display_types}
+display_toggle_types = {key: msg_type for msg_type, key in display_toggle_keys.items()}
+# Each filter is saved as its own settings key, so no parsing is needed when it is loaded
+message_display_filter_keys = {msg_type: f'MessageDisplayFilter.{msg_type}' for msg_type in message_display_types}
+# Matches any of the message types which are filtered out, or None if they are all shown.
+# Rebuilt only when the filters change.
+hidden_display_pattern = None
 display_all_toggle_key = '-display-all-'
+# The last color set on each display filter button, by key, so that unchanged buttons are not updated
+display_button_colors = {}
+# The log and Zephyr displays are write only, so their values are not returned by read()
+log_window_key = '-log_window-' + sg.WRITE_ONLY_KEY
+zephyr_window_key = '-zephyr_window-' + sg.WRITE_ONLY_KEY
 
 # set the overall look of the GUI
 sg.theme('SystemDefault')
@@ -78,6 +140,17 @@ window_params = {'Small': {'font_size': 8, 'width': 100, 'height': 20},
 button_sizes = {'Small': (4,1), 'Medium': (6,1), 'Large': (8,1)}
 window_size = 'Medium'
 
+instruments = ['RATS', 'LPC', 'RACHUTS', 'FLOATS']
+
+# The serial read timeout, in seconds. readline() returns as soon as a line arrives,
+# so this only sets how often an idle port wakes the reader thread, and the longest
+# a line can be delayed while the reader waits on the other port.
+SERIALTIMEOUT = 0.01
+
+# The persistent settings file, in the user's home directory
+SETTINGSFILE = 'OBC_Simulator.ini'
+SETTINGSPATH = os.path.abspath(os.path.expanduser("~/"))
+
 def NormalizeMessageDisplayFilters(filters: dict) -> dict:
     parsed_filters = {}
     if isinstance(filters, dict):
@@ -100,6 +173,45 @@ def NormalizeMessageDisplayFilters(filters: dict) -> dict:
     for msg_type in message_display_types:
         normalized[msg_type] = bool(parsed_filters.get(msg_type, True))
     return normalized
+
+def LoadMessageDisplayFilters(section) -> dict:
+    '''Read the message display filters from a configuration set's settings section
+
+    Filters which have not been saved default to True. A configuration set which still
+    has the old single MessageDisplayFilters entry is migrated to the per-type keys.
+    '''
+    legacy_filters = section.get('MessageDisplayFilters', None)
+    if legacy_filters is not None:
+        filters = NormalizeMessageDisplayFilters(legacy_filters)
+        StoreMessageDisplayFilters(section, filters)
+        del section['MessageDisplayFilters']
+        return filters
+
+    # UserSettings converts the saved 'True'/'False' strings to bools
+    return {msg_type: section.get(key) is not False for msg_type, key in message_display_filter_keys.items()}
+
+def StoreMessageDisplayFilters(section, filters: dict) -> None:
+    for msg_type, key in message_display_filter_keys.items():
+        section[key] = filters[msg_type]
+
+def ListSerialPorts() -> list:
+    '''Return the sorted device names of the serial ports, skipping ports with Bluetooth in the name'''
+    # Only needed by the configuration window, so it is not imported at startup
+    import serial.tools.list_ports
+    return sorted(port.device for port in serial.tools.list_ports.comports() if 'Bluetooth' not in port.device)
+
+def OpenSerialPort(port_name: str) -> serial.Serial:
+    '''Open a port at 115200 baud with an empty input buffer
+
+    The timeout bounds how long the reader thread's readline() blocks on an idle
+    port before checking the other one. Where the driver allows it (Windows), the
+    buffers are enlarged so that a burst of TM data does not overrun between reads.
+    '''
+    port = serial.Serial(port=port_name, baudrate=115200, timeout=SERIALTIMEOUT)
+    if hasattr(port, 'set_buffer_size'):
+        port.set_buffer_size(rx_size=1<<16, tx_size=1<<16)
+    port.reset_input_buffer()
+    return port
 
 def ConfigWindow() -> dict:
     '''Configuration window for the OBC simulator
@@ -132,96 +244,116 @@ def ConfigWindow() -> dict:
 
     global window_size
 
-    settings = sg.UserSettings(filename='OBC_Simulator.ini', use_config_file=True, autosave=True, path=os.path.abspath(os.path.expanduser("~/")))
+    # Autosave would rewrite the whole file for every value that is set, so the settings
+    # are saved explicitly: each time the window is rebuilt after a change, and on Continue.
+    settings = sg.UserSettings(filename=SETTINGSFILE, use_config_file=True, autosave=False, path=SETTINGSPATH)
     if not settings['-Main-']['SelectedConfig']:
         settings['-Main-']['SelectedConfig'] = 'NewSet' # default to the first configuration set
 
     # Create a list of settings keys. This will need to be updated if new settings are added.
-    settings_keys = ['ZephyrPort', 'LogPort', 'Instrument', 'AutoAck', 'AutoGPS', 'WindowSize', 'DataDirectory', 'MessageDisplayFilters']
+    settings_keys = ['ZephyrPort', 'LogPort', 'Instrument', 'AutoAck', 'AutoGPS', 'WindowSize', 'DataDirectory'] + list(message_display_filter_keys.values())
 
-    instruments = ['RATS', 'LPC', 'RACHUTS', 'FLOATS']
+    # Find all of the appropriate serial ports.
+    ports = ListSerialPorts()
 
     # Loop until all parameters are specified
     config = {}
     config_values_validated = False
+    config_window = None
     while not config_values_validated:
-        # Get the current settings. Default values are used if the setting is not found.
-        settings = sg.UserSettings(filename='OBC_Simulator.ini', use_config_file=True, path=os.path.abspath(os.path.expanduser("~/")))
-        config_set = settings['-Main-'].get('SelectedConfig', 'NewSet')
-        data_dir = settings[config_set].get('DataDirectory', None)
-        auto_ack = settings[config_set].get('AutoAck', True)
-        auto_gps = settings[config_set].get('AutoGPS', True)
-        window_size = settings[config_set].get('WindowSize', 'Medium')
-        zephyr_port = settings[config_set].get('ZephyrPort', 'None')
-        log_port = settings[config_set].get('LogPort', 'None')
-        msg_display_filters = NormalizeMessageDisplayFilters(settings[config_set].get('MessageDisplayFilters', {}))
-        settings[config_set]['MessageDisplayFilters'] = msg_display_filters
-
-        # Find all of the appropriate serial ports.
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        # delete ports with Bluetooth in the name
-        ports = [port for port in ports if 'Bluetooth' not in port]
-    
-        # Create radio buttons for instruments and set the default to the saved instrument (if it exists).
-        radio_instruments = [sg.Radio(i, group_id="radio_instruments", key=i, default=(settings[config_set].get('Instrument', False)==i)) for i in instruments]
-        radio_instruments.insert(0, sg.Text('Instrument:'))
-
-        # Create radio buttons for the overall window size and set the default to the saved size (if it exists).
-        radio_window_size = [sg.Radio(s, group_id="radio_window_size", key=s, default=(s==settings[config_set].get('WindowSize', 'Medium'))) for s in window_sizes]
-        radio_window_size.insert(0, sg.Text('Window size:'))
-
-        # Create radio buttons for zephyr ports and set the default to the saved port (if it exists). 
-        # The key is prefixed with 'zephyr_' to differentiate it from the log ports.
-        radio_zephyr_ports = [[sg.Radio(p, group_id="radio_zephyr_ports", key="zephyr_"+p, default=(p==zephyr_port))] for p in ports]
-        radio_zephyr_ports.insert(0, [sg.Text('Zephyr port:')])
-
-        # Create radio buttons for log ports and set the default to the saved port (if it exists).
-        # The key is prefixed with 'log_' to differentiate it from the zephyr ports.
-        radio_log_ports = [[sg.Radio(p, group_id="radio_log_ports", key="log_"+p, default=(p==log_port))] for p in ports]
-        radio_log_ports.insert(0, [sg.Text('Log port:')])
-
-        config_manage = [sg.Text("Configuration set:"), sg.Text(config_set),
-            sg.Button('Select', key='-popup-select-config-', button_color=('white','blue')),
-            sg.Button('Rename', key='-popup-rename-config-', button_color=('white','blue')),
-            sg.Button('New',    key='-popup-new-config-',    button_color=('white','blue')),
-            sg.Button('Delete', key='-popup-delete-config-', button_color=('white','blue'))]
-
-        # Create the layout for the configuration window
-        layout = [
-            config_manage,
-            radio_instruments,
-            [sg.Text('Settings file: ' + settings.full_filename)],
-            [sg.Text("Data Directory:"),
-              sg.Text(data_dir), 
-              sg.Button('Select', key='-select-data-dir-', button_color=('white','blue'))],
-            radio_window_size,
-            [sg.Text('Automatically respond with ACKs?'), 
-              sg.Radio('Yes', group_id='-ack-group-',key='-auto-ack-',default=auto_ack), 
-              sg.Radio('No', group_id='-ack-group-',key='-no-auto-ack-',default=not auto_ack)],
-            [sg.Text('Automatically send GPS?'), 
-              sg.Radio('Yes',group_id='-gps-group-',key='-auto-gps-',default=auto_gps), 
-              sg.Radio('No',group_id='-gps-group-',key='-no-auto-gps',default=not auto_gps)],
-            [sg.Text(" ")],
-            [sg.Text("  Select the same Log and Zephyr ports when StratoCore<INST> is")],
-            [sg.Text("  compiled for port sharing or when the log port is not used.  ")],
-            [sg.Column(radio_zephyr_ports), sg.Column(radio_log_ports)],
-            [sg.Text(" ")],
-            [sg.Button('Continue', key='-continue-', size=(8,1), button_color=('white','blue')),
-             sg.Button('Exit', key='-exit-', size=(8,1), button_color=('white','red'))
+        # The window is only (re)built when the displayed settings have changed.
+        # A failed validation leaves the window open with the user's selections.
+        if config_window is None:
+            # Save any changes from the previous event. The settings object already
+            # holds them, so the file is not reloaded.
+            settings.save()
+
+            # Get the current settings. Default values are used if the setting is not found.
+            config_set = settings['-Main-'].get('SelectedConfig', 'NewSet')
+            data_dir = settings[config_set].get('DataDirectory', None)
+            saved_instrument = settings[config_set].get('Instrument', None)
+            auto_ack = settings[config_set].get('AutoAck', True)
+            auto_gps = settings[config_set].get('AutoGPS', True)
+            window_size = settings[config_set].get('WindowSize', 'Medium')
+            zephyr_port = settings[config_set].get('ZephyrPort', 'None')
+            log_port = settings[config_set].get('LogPort', 'None')
+            msg_display_filters = LoadMessageDisplayFilters(settings[config_set])
+
+            # Create radio buttons for instruments and set the default to the saved instrument (if it exists).
+            radio_instruments = [sg.Radio(i, group_id="radio_instruments", key=i, default=(i==saved_instrument)) for i in instruments]
+            radio_instruments.insert(0, sg.Text('Instrument:'))
+
+            # Create radio buttons for the overall window size and set the default to the saved size (if it exists).
+            radio_window_size = [sg.Radio(s, group_id="radio_window_size", key=s, default=(s==window_size)) for s in window_sizes]
+            radio_window_size.insert(0, sg.Text('Window size:'))
+
+            # Create radio buttons for the zephyr and log ports and set the defaults to the saved ports (if they exist).
+            # The keys are prefixed with 'zephyr_' and 'log_' to differentiate the two groups.
+            radio_zephyr_ports = [[sg.Text('Zephyr port:')]]
+            radio_log_ports = [[sg.Text('Log port:')]]
+            for p in ports:
+                radio_zephyr_ports.append([sg.Radio(p, group_id="radio_zephyr_ports", key="zephyr_"+p, default=(p==zephyr_port))])
+                radio_log_ports.append([sg.Radio(p, group_id="radio_log_ports", key="log_"+p, default=(p==log_port))])
+
+            config_manage = [sg.Text("Configuration set:"), sg.Text(config_set),
+                sg.Button('Select', key='-popup-select-config-', button_color=('white','blue')),
+                sg.Button('Rename', key='-popup-rename-config-', button_color=('white','blue')),
+                sg.Button('New',    key='-popup-new-config-',    button_color=('white','blue')),
+                sg.Button('Delete', key='-popup-delete-config-', button_color=('white','blue'))]
+
+            # Create the layout for the configuration window
+            layout = [
+                config_manage,
+                radio_instruments,
+                [sg.Text('Settings file: ' + settings.full_filename)],
+                [sg.Text("Data Directory:"),
+                  sg.Text(data_dir, key='-data-dir-'), 
+                  sg.Button('Select', key='-select-data-dir-', button_color=('white','blue'))],
+                radio_window_size,
+                [sg.Text('Automatically respond with ACKs?'), 
+                  sg.Radio('Yes', group_id='-ack-group-',key='-auto-ack-',default=auto_ack), 
+                  sg.Radio('No', group_id='-ack-group-',key='-no-auto-ack-',default=not auto_ack)],
+                [sg.Text('Automatically send GPS?'), 
+                  sg.Radio('Yes',group_id='-gps-group-',key='-auto-gps-',default=auto_gps), 
+                  sg.Radio('No',group_id='-gps-group-',key='-no-auto-gps',default=not auto_gps)],
+                [sg.Text(" ")],
+                [sg.Text("  Select the same Log and Zephyr ports when StratoCore<INST> is")],
+                [sg.Text("  compiled for port sharing or when the log port is not used.  ")],
+                [sg.Column(radio_zephyr_ports), sg.Column(radio_log_ports)],
+                [sg.Button('Rescan', key='-rescan-ports-', button_color=('white','blue'), tooltip='Rescan the serial ports')],
+                [sg.Text(" ")],
+                [sg.Button('Continue', key='-continue-', size=(8,1), button_color=('white','blue')),
+                 sg.Button('Exit', key='-exit-', size=(8,1), button_color=('white','red'))
+                ]
             ]
-        ]
 
-        config_window = sg.Window('Configure', layout)
+            config_window = sg.Window('Configure', layout)
         event, values = config_window.read()
 
-        config_window.close()
+        # Process close and exit events
+        if event in (None, '-exit-'):
+            CloseAndExit()
+
+        # The data directory is only shown as text, so it is updated in place
+        if event == '-select-data-dir-':
+            data_dir = sg.popup_get_folder('Select the data directory')
+            if data_dir:
+                settings[config_set]['DataDirectory'] = data_dir
+                settings.save()
+                config_window['-data-dir-'].update(data_dir)
+            continue
+
+        # All other events change the settings or the port list, so the window will be rebuilt
+        if event != '-continue-':
+            config_window.close()
+            config_window = None
 
-        if event in ('-select-data-dir-'):
-            settings[config_set]['DataDirectory'] = sg.popup_get_folder('Select the data directory')
+        if event == '-rescan-ports-':
+            ports = ListSerialPorts()
             continue
 
         if event in ('--popup-select-config--'):
-            configs = [key for key in settings.get_dict().keys() if key != '-Main-']
+            configs = [key for key in settings.config.sections() if key != '-Main-']
             config_set_layout = [[sg.Text("Select Configuration Set:")],
                                  [sg.Combo(configs, default_value=config_set, key='-config_set-')],
                                  [sg.Button('Select', key='-select-config-', button_color=('white','blue'))]
@@ -241,10 +373,7 @@ def ConfigWindow() -> dict:
                 continue
             # Copy current settings to a new config set
             for key in settings_keys:
-                if key == 'MessageDisplayFilters':
-                    settings[new_set_name][key] = NormalizeMessageDisplayFilters(settings[config_set].get(key, {}))
-                else:
-                    settings[new_set_name][key] = settings[config_set].get(key, None)
+                settings[new_set_name][key] = settings[config_set].get(key, None)
             # delete the old config set
             try:
                 settings.delete_section(config_set)
@@ -263,10 +392,7 @@ def ConfigWindow() -> dict:
             settings['-Main-']['SelectedConfig'] = new_config_set
             # Copy current settings to new config set
             for key in settings_keys:
-                if key == 'MessageDisplayFilters':
-                    settings[new_config_set][key] = NormalizeMessageDisplayFilters(settings[config_set].get(key, {}))
-                else:
-                    settings[new_config_set][key] = settings[config_set].get(key, None)
+                settings[new_config_set][key] = settings[config_set].get(key, None)
             continue
 
         if event in ('-popup-delete-config-'):
@@ -278,7 +404,7 @@ def ConfigWindow() -> dict:
             config_events, config_values = popup_window.read()
             popup_window.close()
             if config_events == '-delete-yes-':
-                configs = [key for key in settings.get_dict().keys() if key != '-Main-']
+                configs = [key for key in settings.config.sections() if key != '-Main-']
                 if len(configs) > 1:
                     try:
                         settings.delete_section(config_set)
@@ -289,49 +415,50 @@ def ConfigWindow() -> dict:
                     sg.popup('Cannot delete the last configuration set', title='Error')
             continue
 
-        # Process close and exit events
-        if event in (None, '-exit-'):
-            CloseAndExit()
-
-        # Save settings which don't get saved automagically
-        instrument = [i for i in instruments if values[i] == True]
+        # Save the settings which are only read from the window on Continue
+        instrument = next((i for i in instruments if values[i]), None)
         if instrument:
-            instrument = instrument[0]
             settings[config_set]['Instrument'] = instrument
 
         settings[config_set]['AutoAck'] = values['-auto-ack-']
         settings[config_set]['AutoGPS'] = values['-auto-gps-']
 
-        window_size = [i for i in window_sizes if values[i] == True]
+        window_size = next((w for w in window_sizes if values[w]), None)
         if window_size:
-            window_size = window_size[0]
             settings[config_set]['WindowSize'] = window_size
+        settings.save()
 
-        zephyr_port = [i for i in values if i.startswith('zephyr_') and values[i] == True]
-        log_port = [i for i in values if i.startswith('log_') and values[i] == True]
-        if zephyr_port and log_port and instrument and settings[config_set]['DataDirectory'] and settings[config_set]['WindowSize'] and settings[config_set]['AutoAck']:
-            zephyr_port_name = zephyr_port[0].replace('zephyr_','')
-            log_port_name = log_port[0].replace('log_','')
+        # Only the port radio buttons need to be checked, not every key in values
+        zephyr_port_name = next((p for p in ports if values['zephyr_'+p]), None)
+        log_port_name = next((p for p in ports if values['log_'+p]), None)
+        if zephyr_port_name and log_port_name and instrument and settings[config_set]['DataDirectory'] and settings[config_set]['WindowSize'] and settings[config_set]['AutoAck']:
             # Verify that the zephyr and log ports are both accessible
+            zephyr_serial = None
             try:
-                config['ZephyrPort'] = serial.Serial(port=zephyr_port_name, baudrate=115200, timeout=0.001)
-                config['ZephyrPort'].reset_input_buffer()
-                settings[config_set]['ZephyrPort'] = zephyr_port[0].replace('zephyr_','')
-                settings[config_set]['LogPort'] = log_port[0].replace('log_','')
+                zephyr_serial = OpenSerialPort(zephyr_port_name)
                 if log_port_name != zephyr_port_name:
-                    config['LogPort'] = serial.Serial(port=log_port_name, baudrate=115200, timeout=0.001)
-                    config['LogPort'].reset_input_buffer()
+                    config['LogPort'] = OpenSerialPort(log_port_name)
                     config['SharedPorts'] = False
                 else:
                     config['LogPort'] = None
                     config['SharedPorts'] = True
             except Exception as e:
+                # Close the Zephyr port if only the log port failed, so that it can be opened on the next try
+                if zephyr_serial:
+                    zephyr_serial.close()
                 sg.popup('Error opening serial port: ' + str(e), title='Error')
                 continue
+            config['ZephyrPort'] = zephyr_serial
+            settings[config_set]['ZephyrPort'] = zephyr_port_name
+            settings[config_set]['LogPort'] = log_port_name
             config_values_validated = True
         else:
             sg.popup('Please specify all items', title='Error')
 
+    # Save the validated port names
+    settings.save()
+    config_window.close()
+
     # Return the selected parameters as a dictionary.
     config['Instrument'] = settings[config_set]['Instrument']
     config['AutoAck'] = settings[config_set]['AutoAck']
@@ -342,19 +469,27 @@ def ConfigWindow() -> dict:
     config['MessageDisplayFilters'] = msg_display_filters
 
     # Print the selected parameters to the debug window.
-    sg.Print("Instrument:", config['Instrument'])
-    sg.Print("Zephyr Port:", config['ZephyrPort'])
-    sg.Print("Log Port:", config['LogPort'])
-    sg.Print("AutoAck:", config['AutoAck'])
+    sg.Print(f"Instrument: {config['Instrument']}\n"
+             f"Zephyr Port: {config['ZephyrPort']}\n"
+             f"Log Port: {config['LogPort']}\n"
+             f"AutoAck: {config['AutoAck']}")
 
     return config
 
+def ButtonRow(buttons: list, size: tuple, **button_options) -> list:
+    '''Return a row of buttons for a list of (name, tooltip) pairs
+
+    A new row is built on each call, since a Qt widget can only belong to one window.
+    The button name is also its event key.
+    '''
+    return [sg.Button(name, size=size, tooltip=tip, **button_options) for name, tip in buttons]
+
 def MainWindow(
     config: dict, 
     logport: serial.Serial, 
     zephyrport: serial.Serial, 
     cmd_fname: str, 
-    xmlqueue: queue.Queue
+    xmlqueue: collections.deque
 ) -> None:
     """
     Main window for the OBC simulator.
@@ -367,12 +502,18 @@ def MainWindow(
         logport (serial.Serial): Serial port object for logging messages.
         zephyrport (serial.Serial): Serial port object for Zephyr messages.
         cmd_fname (str): Filename for command file.
-        xmlqueue (queue.Queue): Queue for XML messages.
+        xmlqueue (collections.deque): Queue for XML messages.
     Returns:
         None
     """
 
     global main_window
+    global log_display
+    global zephyr_display
+    global suspend_button
+    global tc_input
+    global gps_input
+    global tm_dir_input
     global log_port
     global zephyr_port
     global instrument
@@ -380,23 +521,24 @@ def MainWindow(
     global xml_queue
     global message_display_filters
     global active_config_set
+    global shared_ports
 
     instrument = config['Instrument']
     log_port = logport
     zephyr_port = zephyrport
+    shared_ports = config['SharedPorts']
     cmd_filename = cmd_fname
     xml_queue = xmlqueue
     active_config_set = config['ConfigSet']
     message_display_filters = NormalizeMessageDisplayFilters(config.get('MessageDisplayFilters', {}))
+    UpdateHiddenDisplayPattern()
 
     sg.set_options(font = ("Monaco", config['WindowParams']['font_size']))
     w = config['WindowParams']['width']
     h = config['WindowParams']['height']
     b_size = button_sizes[window_size]
     # Command buttons and config values at the top of the window
-    mode_button_row = []
-    for b,t in ZephyrInstModes:
-        mode_button_row.append(sg.Button(b, size=b_size, button_color=('black','lightblue'),tooltip=t))
+    mode_button_row = ButtonRow(ZephyrInstModes, b_size, button_color=('black','lightblue'))
 
     mode_select_box = sg.Column(
         [
@@ -428,16 +570,10 @@ def MainWindow(
         pad=((6, 6), (4, 6))
     )
 
-    zephyr_tooltips = {name: tip for name, tip in ZephyrMessagesNoParams}
     zephyr_commands_box = sg.Column(
         [
             [sg.Text('Zephyr Commands')],
-            [
-                sg.Button('SW', size=b_size, tooltip=zephyr_tooltips.get('SW', 'Send a Shutdown Warning')),
-                sg.Button('SAck', size=b_size, tooltip=zephyr_tooltips.get('SAck', 'Send a Safety Ack')),
-                sg.Button('RAAck', size=b_size, tooltip=zephyr_tooltips.get('RAAck', 'Send a RAA Ack')),
-                sg.Button('TMAck', size=b_size, tooltip=zephyr_tooltips.get('TMAck', 'Send a TM Ack'))
-            ]
+            ButtonRow(ZephyrMessagesNoParams, b_size)
         ],
         pad=((6, 6), (4, 6))
     )
@@ -499,8 +635,8 @@ def MainWindow(
     widgets = [
         [mode_select_box, tc_box, sza_box, zephyr_commands_box, suspend_exit_box, sg.Text(' ')] + button_row,
         display_filter_box,
-        [sg.Column([[sg.Text('StratoCore Log Messages')], [sg.MLine(key='-log_window-'+sg.WRITE_ONLY_KEY, size=(w/4,h))]]),
-         sg.Column([[sg.Text(f'Messages TO/FROM {instrument}')], [sg.MLine(key='-zephyr_window-'+sg.WRITE_ONLY_KEY, size=(3*w/4,h))]])],
+        [sg.Column([[sg.Text('StratoCore Log Messages')], [sg.MLine(key=log_window_key, size=(w/4,h))]]),
+         sg.Column([[sg.Text(f'Messages TO/FROM {instrument}')], [sg.MLine(key=zephyr_window_key, size=(3*w/4,h))]])],
         config_row,
         files_row
     ]
@@ -510,38 +646,36 @@ def MainWindow(
         main_window = sg.Window(title=instrument, layout=widgets, icon=r'./icon.ico', finalize=True)
     else:
         main_window = sg.Window(title=instrument, layout=widgets, finalize=True)
+
+    # Keep the elements which are used repeatedly, so that they are not looked up every time
+    log_display = main_window[log_window_key]
+    zephyr_display = main_window[zephyr_window_key]
+    suspend_button = main_window['-suspend-']
+    tc_input = main_window['-tc-text-']
+    gps_input = main_window['-gps-text-']
+    tm_dir_input = main_window['-tm_directory-']
+
     UpdateDisplayFilterButtons()
 
 def AddMsgToLogDisplay(message: str) -> None:
     """
-    Add a message to the log window.
+    Add a message to the log window buffer. It is displayed by the next FlushDisplayBuffers().
     If the message contains 'ERR: ', the text color is set to red.
     Args:
-        message (str): The message to be added to the log window.
+        message (str): The message to be added to the log window. It is already trimmed
+                       and ends with a single newline, as queued by OBC_Parser.
     Returns:
         None
     """
-    global main_window
-    global log_line_count
-
-    if log_line_count > MAXLOGLINES:
-        log_lines = main_window['-log_window-'+sg.WRITE_ONLY_KEY].get().split('\n')
-        log_lines = log_lines[-KEEPLOGLINES:]
-        main_window['-log_window-'+sg.WRITE_ONLY_KEY].update(value='\n'.join(log_lines))
-        log_line_count = KEEPLOGLINES
-
-    log_line_count += 1
-
-    message = message.strip()
-
-    if -1 != message.find('ERR: '):
-        main_window['-log_window-'+sg.WRITE_ONLY_KEY].print(message, text_color='red', end="\n")
+    if 'ERR: ' in message:
+        log_display_buffer.append((message, 'red'))
     else:
-        main_window['-log_window-'+sg.WRITE_ONLY_KEY].print(message, end="\n")
+        log_display_buffer.append((message, None))
 
 def AddMsgToZephyrDisplay(message: str) -> None:
     """
-    Add a message to the Zephyr window with color coding based on message type.
+    Add a message to the Zephyr window buffer with color coding based on message type.
+    It is displayed by the next FlushDisplayBuffers().
     Parameters:
     message (str): The message to be added to the Zephyr window. The color of the message
                    is determined by its content:
@@ -553,47 +687,121 @@ def AddMsgToZephyrDisplay(message: str) -> None:
     Returns:
     None
     """
-    global main_window
-
     if not ShouldDisplayMessage(message):
         return
 
-    if -1 != message.find('(TO)'):
-        main_window['-zephyr_window-'+sg.WRITE_ONLY_KEY].print(message, text_color='blue', end="")
-    elif -1 != message.find('TM') and -1 != message.find('CRIT'):
-        main_window['-zephyr_window-'+sg.WRITE_ONLY_KEY].print(message, text_color='red', end="")
-    elif -1 != message.find('TM') and -1 != message.find('WARN'):
-        main_window['-zephyr_window-'+sg.WRITE_ONLY_KEY].print(message, text_color='orange', end="")
-    elif -1 != message.find('TM'):
-        main_window['-zephyr_window-'+sg.WRITE_ONLY_KEY].print(message, text_color='green', end="")
-    else:
-        main_window['-zephyr_window-'+sg.WRITE_ONLY_KEY].print(message, end="")
+    zephyr_display_buffer.append((message, ZephyrMessageColor(message)))
+
+def FlushDisplayBuffers() -> None:
+    """
+    Print the buffered debug, log and Zephyr messages.
+    Consecutive messages of the same color are joined and printed with a single call,
+    so that a burst of messages causes one widget update per color run instead of one per message.
+    While the main window is minimized the log and Zephyr messages stay buffered, and are printed
+    when it is restored. Only the most recent KEEPLOGLINES log and MAXZEPHYRBUFFER Zephyr messages
+    are kept, so that a long minimized run neither grows without bound nor floods the displays on restore.
+    Returns:
+        None
+    """
+    global log_line_count
+
+    if debug_display_buffer:
+        for error, run in itertools.groupby(debug_display_buffer, key=lambda item: item[1]):
+            text = ''.join(item[0] for item in run)
+            if error:
+                sg.Print(text, end='', background_color='red')
+            else:
+                sg.Print(text, end='')
+        debug_display_buffer.clear()
+
+    if main_window.QT_QMainWindow.isMinimized():
+        # The log display would be trimmed anyway, so only keep as many lines as it would
+        if len(log_display_buffer) > MAXLOGLINES:
+            del log_display_buffer[:-KEEPLOGLINES]
+        if len(zephyr_display_buffer) > MAXZEPHYRBUFFER:
+            del zephyr_display_buffer[:-MAXZEPHYRBUFFER]
+        return
+
+    if log_display_buffer:
+        log_lines.extend(log_display_buffer)
+        if log_line_count + len(log_display_buffer) > MAXLOGLINES:
+            log_display.update(value='')
+            PrintColorRuns(log_display, log_lines)
+            log_line_count = len(log_lines)
+        else:
+            PrintColorRuns(log_display, log_display_buffer)
+            log_line_count += len(log_display_buffer)
+        log_display_buffer.clear()
+
+    if zephyr_display_buffer:
+        PrintColorRuns(zephyr_display, zephyr_display_buffer)
+        zephyr_display_buffer.clear()
+
+def PrintColorRuns(display: sg.Multiline, buffer: list) -> None:
+    for color, run in itertools.groupby(buffer, key=lambda item: item[1]):
+        text = ''.join(item[0] for item in run)
+        if color:
+            display.print(text, text_color=color, end="")
+        else:
+            display.print(text, end="")
+
+def ZephyrMessageColor(message: str) -> str:
+    """
+    Classify a Zephyr message with a single scan for the color tokens.
+    Returns:
+    The color from the first matching rule in ZephyrColorRules, or None for the default color.
+    """
+    tokens = set(ZephyrColorTokens.findall(message))
+    for required, color in ZephyrColorRules:
+        if required <= tokens:
+            return color
+    return None
 
 def AddDebugMsg(message: str, error: bool = False) -> None:
     """
-    Adds a debug message to the output.
+    Adds a debug message to the debug window buffer. It is printed by the next FlushDisplayBuffers().
     Parameters:
     message (str): The debug message to be printed.
     error (bool): If True, the message is printed with a red background to indicate an error. Defaults to False.
     Returns:
     None
     """
-    if not error:
-        sg.Print(message)
-    else:
-        sg.Print(message, background_color='red')
+    debug_display_buffer.append((message + '\n', error))
 
-def PollWindowEvents() -> None:
+def PollWindowEvents(wait: bool = True) -> None:
     """
     Poll the main window for events.
+    Parameters:
+    wait (bool): If True, wait up to poll_timeout ms for an event. If False, only process events
+                 which are already pending, so that queued instrument messages are not delayed.
     Global Variables:
     - main_window: The main window object.
     - serial_suspended: A boolean indicating if the serial connection is suspended.
+    - idle_poll_count, poll_timeout: The idle backoff state.
     Returns: None
     """
-    global main_window, serial_suspended
+    global idle_poll_count, poll_timeout
 
-    main_window_event, _ = main_window.read(timeout=10)
+    if not wait:
+        timeout = 0
+    elif serial_suspended:
+        timeout = SUSPENDEDPOLLTIMEOUT
+    else:
+        timeout = poll_timeout
+    main_window_event, _ = main_window.read(timeout=timeout)
+
+    # The timeout doubles after each idle wait, up to MAXPOLLTIMEOUT, and is reset
+    # when there is a window event or queued serial traffic
+    if main_window_event == sg.TIMEOUT_KEY and wait:
+        idle_poll_count += 1
+        poll_timeout = min(MAXPOLLTIMEOUT, MINPOLLTIMEOUT << min(idle_poll_count, 4))
+    else:
+        idle_poll_count = 0
+        poll_timeout = MINPOLLTIMEOUT
+
+    # Nothing happened in the window, so skip the event dispatch
+    if main_window_event == sg.TIMEOUT_KEY:
+        return
 
     if main_window_event in (None, '-exit-'):
         CloseAndExit()
@@ -602,78 +810,64 @@ def PollWindowEvents() -> None:
         # toggle the suspend state
         SerialSuspend()
         if serial_suspended:
-            main_window["-suspend-"].update('Resume', button_color=('white','blue'))
+            suspend_button.update('Resume', button_color=('white','blue'))
         else:
-            main_window["-suspend-"].update('Suspend', button_color=('white','orange'))
+            suspend_button.update('Suspend', button_color=('white','orange'))
 
-    if serial_suspended:
-        return
-    
+    # The copy and display filter buttons do not use the serial ports, so they work while suspended
     if main_window_event in ['-copy-tm-dir-']:
-        pyperclip.copy(main_window['-tm_directory-'].get())
+        # Only needed by the copy button, so it is not imported at startup
+        import pyperclip
+        pyperclip.copy(tm_dir)
+        return
 
     if main_window_event == display_all_toggle_key:
         ToggleAllMessageDisplayFilters()
         return
 
-    if main_window_event in display_toggle_keys.values():
-        for msg_type, key in display_toggle_keys.items():
-            if main_window_event == key:
-                ToggleMessageDisplayFilter(msg_type)
-                return
+    toggle_type = display_toggle_types.get(main_window_event)
+    if toggle_type:
+        ToggleMessageDisplayFilter(toggle_type)
+        return
 
-    if main_window_event in [mode[0] for mode in ZephyrInstModes]:
-        im_msg = OBC_Sim_Generic.sendIM(instrument, main_window_event, cmd_filename, zephyr_port)
-        AddMsgToXmlQueue(im_msg)
-
-    if main_window_event == 'TC':
-        TCMessage()
-
-    if main_window_event == 'GPS':
-        GPSMessage()
-
-    if main_window_event == 'SW':
-        SWMessage()
-    
-    if main_window_event == 'SAck':
-        SAckMessage()
-
-    if main_window_event == 'RAAck':
-        RAAckMessage()
-
-    if main_window_event == 'TMAck':
-        TMAckMessage()
+    if serial_suspended:
+        return
+
+    handler = ButtonHandlers.get(main_window_event)
+    if handler:
+        handler()
 
     return
 
+def IMMessage(mode: str) -> None:
+    timestring = OBC_Sim_Generic.GetTimeString()
+    im_msg = OBC_Sim_Generic.sendIM(instrument, mode, cmd_filename, zephyr_port)
+    AddMsgToXmlQueue(im_msg, timestring)
+
 def TCMessage() -> None:
-    global main_window
-    time, millis = OBC_Sim_Generic.GetTime()
-    timestring = '[' + time + '.' + millis + '] '
-    tc_text = main_window['-tc-text-'].get() + ';'
+    timestring = OBC_Sim_Generic.GetTimeString()
+    tc_text = tc_input.get() + ';'
     if tc_text == ';':
         sg.popup('TC text must not be empty', non_blocking=True)
     else:
-        sg.Print(timestring + "Sending TC:", tc_text)
+        AddDebugMsg(timestring + "Sending TC: " + tc_text)
         msg = OBC_Sim_Generic.sendTC(instrument, tc_text, cmd_filename, zephyr_port)
-        AddMsgToXmlQueue(msg)
+        AddMsgToXmlQueue(msg, timestring)
 
 def GPSMessage() -> None:
-    global main_window
-    sza_text = main_window['-gps-text-'].get()
-    sza = None
-    try:
-        sza = float(sza_text)
-        if sza > 180 or sza < 0:
-            sg.popup('SZA must be between 0 and 180', non_blocking=True)
-    except:
+    sza_text = gps_input.get().strip()
+    if not SZAFormat.fullmatch(sza_text):
         sg.popup('SZA must be a float', non_blocking=True)
-    if sza != None:  
-        time, millis = OBC_Sim_Generic.GetTime()
-        timestring = '[' + time + '.' + millis + '] '
-        sg.Print(timestring + "Sending GPS, SZA =", str(sza))
-        msg = OBC_Sim_Generic.sendGPS(sza, cmd_filename, zephyr_port)
-        AddMsgToXmlQueue(msg)
+        return
+    sza = float(sza_text)
+    if sza > 180 or sza < 0:
+        sg.popup('SZA must be between 0 and 180', non_blocking=True)
+        return
+
+    timestring = OBC_Sim_Generic.GetTimeString()
+    AddDebugMsg(timestring + "Sending GPS, SZA = " + str(sza))
+    msg = OBC_Sim_Generic.sendGPS(sza, cmd_filename, zephyr_port)
+    AddMsgToXmlQueue(msg, timestring)
 
 def SWMessage() -> None:
     """
@@ -685,64 +879,55 @@ def SWMessage() -> None:
         None
     """
 
-    time, millis = OBC_Sim_Generic.GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = OBC_Sim_Generic.GetTimeString()
 
-    sg.Print(timestring + "Sending shutdown warning")
+    AddDebugMsg(timestring + "Sending shutdown warning")
     OBC_Sim_Generic.sendSW(instrument, cmd_filename, zephyr_port)
 
-def SAckMessage() -> None:
-    """
-    Sends a safety acknowledgment message.
-    This function retrieves the current time and formats it into a string. It then prints
-    a message indicating that a safety acknowledgment is being sent. The function sends 
-    the safety acknowledgment message using the `OBC_Sim_Generic.sendSAck` method and adds the message to a queue.
-    Returns:
-        None
-    """
-    time, millis = OBC_Sim_Generic.GetTime()
-    timestring = '[' + time + '.' + millis + '] '
-
-    sg.Print(timestring + "Sending safety ack")
-    msg = OBC_Sim_Generic.sendSAck(instrument, 'ACK', cmd_filename, zephyr_port)
-    AddMsgToXmlQueue(msg)
-
-def RAAckMessage() -> None:
+def AckMessage(ack: str) -> None:
     """
-    Sends an RA acknowledgment message and logs the event with a timestamp.
-    This function retrieves the current time, formats it into a string, and logs
-    the sending of an RA acknowledgment message. It then sends the RA acknowledgment
-    message using the `OBC_Sim_Generic.sendRAAck` function and places the message
-    into a queue.
-    Returns:
-        None
-    """
-    time, millis = OBC_Sim_Generic.GetTime()
-    timestring = '[' + time + '.' + millis + '] '
-
-    sg.Print(timestring + "Sent RAAck")
-    msg = OBC_Sim_Generic.sendRAAck(instrument, 'ACK', cmd_filename, zephyr_port)
-    AddMsgToXmlQueue(msg)
-
-def TMAckMessage() -> None:
-    """
-    Sends a telemetry acknowledgment message.
+    Sends an acknowledgment message.
+    This function prints a timestamped message indicating which acknowledgment is being sent,
+    sends it using the matching `OBC_Sim_Generic` sender from `ZephyrAcks`, and adds the
+    message to the XML queue.
+    Parameters:
+    ack (str): The acknowledgment to send; one of the keys of `ZephyrAcks`.
     Returns:
         None
     """
-    time, millis = OBC_Sim_Generic.GetTime()
-    timestring = '[' + time + '.' + millis + '] '
-
-    sg.Print(timestring + "Sending TM ack")
-    msg = OBC_Sim_Generic.sendTMAck(instrument, 'ACK', cmd_filename, zephyr_port)
-    AddMsgToXmlQueue(msg)
+    sender, label = ZephyrAcks[ack]
+    timestring = OBC_Sim_Generic.GetTimeString()
+
+    AddDebugMsg(timestring + "Sending " + label)
+    msg = sender(instrument, 'ACK', cmd_filename, zephyr_port)
+    AddMsgToXmlQueue(msg, timestring)
+
+# The handlers for the Zephyr message and instrument mode buttons in the main window
+ButtonHandlers = {
+    'TC':    TCMessage,
+    'GPS':   GPSMessage,
+    'SW':    SWMessage,
+    'SAck':  functools.partial(AckMessage, 'SAck'),
+    'RAAck': functools.partial(AckMessage, 'RAAck'),
+    'TMAck': functools.partial(AckMessage, 'TMAck')
+}
+ButtonHandlers.update({mode: functools.partial(IMMessage, mode) for mode, _ in ZephyrInstModes})
 
 def CloseAndExit() -> None:
     """
+    Close the main window and exit, after letting any pending serial output drain.
+    os._exit() is used because the OBC_Parser reader thread never returns, but it
+    also skips the interpreter shutdown, so the ports are flushed and closed here first.
     """
-    global main_window
     if main_window != None:
         main_window.close()
+    for port in (zephyr_port, log_port):
+        if port is not None and port.is_open:
+            try:
+                port.flush()
+                port.close()
+            except serial.SerialException:
+                pass
     os._exit(0)
 
 def SerialSuspend() -> None:
@@ -751,72 +936,74 @@ def SerialSuspend() -> None:
     This function toggles the state of the serial ports. If the serial ports
     are currently active, it will close them and set the `serial_suspended`
     flag to True. If the serial ports are currently suspended, it will open
-    them and set the `serial_suspended` flag to False.
+    them and set the `serial_suspended` flag to False. If a port cannot be
+    reopened (e.g. the adapter was unplugged), an error is shown and the ports
+    stay suspended.
     Globals:
         serial_suspended (bool): A flag indicating whether the serial ports
                                  are currently suspended.
         log_port (serial.Serial): The serial port used for logging.
         zephyr_port (serial.Serial): The main serial port used for communication.
+        shared_ports (bool): Whether the log messages arrive on the Zephyr port.
     Returns:
         None
     """
     global serial_suspended
-    global log_port
-    global zephyr_port
 
     if not serial_suspended:
         zephyr_port.close()
-        if log_port and zephyr_port.name != log_port.name:
+        if not shared_ports:
             log_port.close()
         serial_suspended = True
     else:
-        zephyr_port.open()
-        if log_port and zephyr_port.name != log_port.name:
-            log_port.open()
+        try:
+            if not zephyr_port.is_open:
+                zephyr_port.open()
+            if not shared_ports and not log_port.is_open:
+                log_port.open()
+        except serial.SerialException as e:
+            # Leave both ports closed, so that the reader thread stays idle
+            zephyr_port.close()
+            sg.popup('Error reopening serial port: ' + str(e), title='Error', non_blocking=True)
+            return
         serial_suspended = False
 
-def AddMsgToXmlQueue(msg: str) -> None:
+def AddMsgToXmlQueue(msg: str, timestring: str) -> None:
     """
     Adds a message to the global XML queue with a timestamp.
-    This function takes a string message, adds XML tags to it to make it XML parsable,
-    and then puts it into the global `xml_queue` with a timestamp.
+    This function takes a string message, joins it into a single line,
+    and then appends it to the global `xml_queue` with a timestamp.
     Args:
         msg (str): The message to be added to the queue.
+        timestring (str): The timestamp prefix from OBC_Sim_Generic.GetTimeString(), taken
+                          by the caller so that the debug window and the queue entry agree.
     Returns:
         None
     """
-    global xml_queue
-    time, millis = OBC_Sim_Generic.GetTime()
-    timestring = '[' + time + '.' + millis + '] '
-
-    # Add tags to make the message XML parsable
-    newmsg = '<XMLTOKEN>' + msg + '</XMLTOKEN>'
-    dict = xmltodict.parse(newmsg)
-    xml_queue.put(f'{timestring}  (TO) {dict["XMLTOKEN"]}\n')  
+    xml_queue.append(f'{timestring}  (TO) {OBC_Sim_Generic.FlattenXML(msg)}\n')
 
 def SetTmDir(filename: str) -> None:
-    global main_window
-    main_window['-tm_directory-'].update(filename)
+    global tm_dir
+
+    # Keep a copy, so the copy button does not need to read it back from the read only input
+    tm_dir = filename
+    tm_dir_input.update(filename)
+
+def MessageTypePattern(msg_types: list) -> re.Pattern:
+    '''Compile a pattern which matches 'type':, "type": or <type> for any of msg_types, in a single search'''
+    alternatives = '|'.join(re.escape(msg_type) for msg_type in msg_types)
+    return re.compile(f'([\'"])(?:{alternatives})\\1:|<(?:{alternatives})>')
 
-def MessageMatchesType(message: str, msg_type: str) -> bool:
-    if f"'{msg_type}':" in message:
-        return True
-    if f'"{msg_type}":' in message:
-        return True
-    if f'<{msg_type}>' in message:
-        return True
-    return False
+def UpdateHiddenDisplayPattern() -> None:
+    '''Rebuild the pattern of the filtered out message types. Call this whenever message_display_filters changes.'''
+    global hidden_display_pattern
+
+    hidden_types = [msg_type for msg_type in message_display_types if not message_display_filters[msg_type]]
+    hidden_display_pattern = MessageTypePattern(hidden_types) if hidden_types else None
 
 def ShouldDisplayMessage(message: str) -> bool:
-    matched_type = False
-    for msg_type in message_display_types:
-        if MessageMatchesType(message, msg_type):
-            matched_type = True
-            if not message_display_filters[msg_type]:
-                return False
-    if matched_type:
-        return True
-    return True
+    # A message is hidden if it matches any filtered out type
+    return hidden_display_pattern is None or hidden_display_pattern.search(message) is None
 
 def GetDisplayButtonColor(msg_type: str, enabled: bool) -> tuple:
     if not enabled:
@@ -827,21 +1014,27 @@ def GetDisplayButtonColor(msg_type: str, enabled: bool) -> tuple:
         return ('white', 'blue')
     return ('black', 'green')
 
+def SetDisplayButtonColor(key: str, button_color: tuple) -> None:
+    if display_button_colors.get(key) == button_color:
+        return
+    main_window[key].update(button_color=button_color)
+    display_button_colors[key] = button_color
+
 def UpdateDisplayFilterButtons() -> None:
-    global main_window
     if not main_window:
         return
     for msg_type in message_display_types:
-        main_window[display_toggle_keys[msg_type]].update(button_color=GetDisplayButtonColor(msg_type, message_display_filters[msg_type]))
+        SetDisplayButtonColor(display_toggle_keys[msg_type], GetDisplayButtonColor(msg_type, message_display_filters[msg_type]))
     if all(message_display_filters.values()):
-        main_window[display_all_toggle_key].update(button_color=('black', 'green'))
+        SetDisplayButtonColor(display_all_toggle_key, ('black', 'green'))
     elif any(message_display_filters.values()):
-        main_window[display_all_toggle_key].update(button_color=('black', 'orange'))
+        SetDisplayButtonColor(display_all_toggle_key, ('black', 'orange'))
     else:
-        main_window[display_all_toggle_key].update(button_color=('white', 'gray'))
+        SetDisplayButtonColor(display_all_toggle_key, ('white', 'gray'))
 
 def ToggleMessageDisplayFilter(msg_type: str) -> None:
     message_display_filters[msg_type] = not message_display_filters[msg_type]
+    UpdateHiddenDisplayPattern()
     SaveMessageDisplayFiltersToSettings()
     UpdateDisplayFilterButtons()
 
@@ -849,12 +1042,14 @@ def ToggleAllMessageDisplayFilters() -> None:
     target_state = not all(message_display_filters.values())
     for msg_type in message_display_types:
         message_display_filters[msg_type] = target_state
+    UpdateHiddenDisplayPattern()
     SaveMessageDisplayFiltersToSettings()
     UpdateDisplayFilterButtons()
 
 def SaveMessageDisplayFiltersToSettings() -> None:
-    global active_config_set
     if not active_config_set:
         return
-    settings = sg.UserSettings(filename='OBC_Simulator.ini', use_config_file=True, autosave=True, path=os.path.abspath(os.path.expanduser("~/")))
-    settings[active_config_set]['MessageDisplayFilters'] = NormalizeMessageDisplayFilters(message_display_filters)
+    # Reload the file, so that changes saved by another simulator since startup are kept
+    settings = sg.UserSettings(filename=SETTINGSFILE, use_config_file=True, autosave=False, path=SETTINGSPATH)
+    StoreMessageDisplayFilters(settings[active_config_set], message_display_filters)
+    settings.save()
@@ -30,11 +30,10 @@ import OBC_Parser
 import OBC_Sim_Generic
 import os
 import argparse
-import xmltodict
 import datetime
 
 # libraries
-import threading, serial, queue, os
+import threading, serial, queue, collections, os
 
 # globals
 instrument = ''
@@ -43,6 +42,18 @@ xml_filename = ''
 cmd_filename = ''
 tm_dir = ''
 
+# The most messages held for the log and Zephyr displays. If the GUI falls behind,
+# the oldest messages are dropped. All messages are still written to the log files.
+INSTQUEUESIZE = 2000
+XMLQUEUESIZE = 10000
+
+# The ack senders for the commands placed on cmd_queue by OBC_Parser
+AutoAckSenders = {
+    'TMAck': OBC_Sim_Generic.sendTMAck,
+    'SAck':  OBC_Sim_Generic.sendSAck,
+    'RAAck': OBC_Sim_Generic.sendRAAck
+}
+
 def FileSetup(config:dict) -> None:
     global inst_filename
     global xml_filename
@@ -87,14 +98,10 @@ def parse_args() -> argparse.Namespace:
     args = parser.parse_args()
     return args
 
-def msg_to_queue(q: queue.Queue, timestring: str, msg: str) -> None:
-    global xml_queue
+def msg_to_queue(q: collections.deque, timestring: str, msg: str) -> None:
     if msg == None:
         return
-    # Add tags to make the message XML parsable
-    newmsg = '<XMLTOKEN>' + msg + '</XMLTOKEN>'
-    dict = xmltodict.parse(newmsg)
-    q.put(f'{timestring}  (TO) {dict["XMLTOKEN"]}\n')  
+    q.append(f'{timestring}  (TO) {OBC_Sim_Generic.FlattenXML(msg)}\n')
 
 def main() -> None:
     global instrument
@@ -102,8 +109,8 @@ def main() -> None:
     args = parse_args()
 
     # create queues for instrument messages
-    inst_queue = queue.Queue(maxsize=50)
-    xml_queue = queue.Queue()
+    inst_queue = collections.deque(maxlen=INSTQUEUESIZE)
+    xml_queue = collections.deque(maxlen=XMLQUEUESIZE)
     cmd_queue = queue.Queue()
 
     # get configuration
@@ -142,41 +149,36 @@ def main() -> None:
     sza = 120
 
     while True:
-        # poll the GUI
-        OBC_GUI.PollWindowEvents()
-
-        current_time, millis = OBC_Sim_Generic.GetTime()
-        timestring = '[' + current_time + '.' + millis + '] '
+        # poll the GUI, only waiting for events when there are no instrument messages to handle
+        OBC_GUI.PollWindowEvents(wait=not inst_queue and not xml_queue and cmd_queue.empty())
 
         # send GPS messages every 60 seconds
         now_timestamp = datetime.datetime.now().timestamp()
         if config["AutoGPS"] and now_timestamp - last_gps_timestamp >= 60:
             last_gps_timestamp = now_timestamp
             gps_msg = OBC_Sim_Generic.sendGPS(sza, cmd_filename, config['ZephyrPort'])
-            msg_to_queue(xml_queue, timestring, gps_msg)
+            msg_to_queue(xml_queue, OBC_Sim_Generic.GetTimeString(), gps_msg)
 
         # handle instrument queues
-        if not inst_queue.empty():
-            OBC_GUI.AddMsgToLogDisplay(inst_queue.get())
-        if not xml_queue.empty():
-            OBC_GUI.AddMsgToZephyrDisplay(xml_queue.get())
+        while inst_queue:
+            OBC_GUI.AddMsgToLogDisplay(inst_queue.popleft())
+        # display every XML message that has arrived since the last poll
+        while xml_queue:
+            OBC_GUI.AddMsgToZephyrDisplay(xml_queue.popleft())
         if not cmd_queue.empty():
             cmd = cmd_queue.get()
             if auto_ack:
-                if 'TMAck' == cmd:
-                    msg = OBC_Sim_Generic.sendTMAck(instrument, 'ACK', cmd_filename, config['ZephyrPort'])
+                send_ack = AutoAckSenders.get(cmd)
+                if send_ack:
+                    timestring = OBC_Sim_Generic.GetTimeString()
+                    msg = send_ack(instrument, 'ACK', cmd_filename, config['ZephyrPort'])
                     msg_to_queue(xml_queue, timestring, msg)
-                    OBC_GUI.AddDebugMsg(timestring + 'Sent TMAck')
-                elif 'SAck' == cmd:
-                    msg = OBC_Sim_Generic.sendSAck(config['Instrument'], 'ACK', cmd_filename, config['ZephyrPort'])
-                    msg_to_queue(xml_queue, timestring, msg)
-                    OBC_GUI.AddDebugMsg(timestring + 'Sent SAck')
-                elif 'RAAck' == cmd:
-                    msg = OBC_Sim_Generic.sendRAAck(instrument, 'ACK', cmd_filename, config['ZephyrPort'])
-                    msg_to_queue(xml_queue, timestring, msg)
-                    OBC_GUI.AddDebugMsg(timestring + 'Sent RAAck')
+                    OBC_GUI.AddDebugMsg(timestring + 'Sent ' + cmd)
                 else:
                     OBC_GUI.AddDebugMsg('Unknown command', True)
 
+        # update the displays with everything that was handled in this pass
+        OBC_GUI.FlushDisplayBuffers()
+
 if (__name__ == '__main__'):
     main()
@@ -21,6 +21,7 @@ Functions:
 
 import serial
 import queue
+import collections
 import datetime
 import xmltodict
 import time
@@ -51,11 +52,11 @@ def HandleStratoLogMessage(message: str) -> None:
 
     # formulate the time
     _, time, _, milliseconds = GetDateTime()
-    timestring = '[' + time + '.' + milliseconds + '] '
+    timestring = f'[{time}.{milliseconds}] '
 
     # place on the queue to be displayed in the GUI
     message = timestring + message
-    inst_queue.put(message)
+    inst_queue.append(message)
 
     # log to the file
     with open(inst_filename, 'a') as inst:
@@ -63,7 +64,7 @@ def HandleStratoLogMessage(message: str) -> None:
 
 def HandleZephyrMessage(first_line: str) -> None:
     next_lines = ''
-    while next_lines.find('</CRC>') == -1:
+    while '</CRC>' not in next_lines:
         next_lines = next_lines + zephyr_port.readline().decode('ascii')
     message = first_line + next_lines
 
@@ -95,11 +96,11 @@ def HandleZephyrMessage(first_line: str) -> None:
 
     # formulate the time
     _, time, _, milliseconds = GetDateTime()
-    timestring = '[' + time + '.' + milliseconds + '] '
+    timestring = f'[{time}.{milliseconds}] '
 
     # place on the queue to be displayed in the GUI
     display = f'{timestring} (FROM){msg_dict["XMLTOKEN"]}\n'
-    xml_queue.put(display)
+    xml_queue.append(display)
 
     # log to the file
     with open(xml_filename, 'a') as xml:
@@ -116,8 +117,8 @@ def WriteTMFile(message: str, binary: bytes) -> None:
 
 # This function is run as a thread from OBC_Main.
 def ReadInstrument(
-    inst_queue_in: queue.Queue,
-    xml_queue_in: queue.Queue,
+    inst_queue_in: collections.deque,
+    xml_queue_in: collections.deque,
     logport: serial.Serial,
     zephyrport: serial.Serial,
     inst_filename_in: str,
@@ -185,8 +186,9 @@ def ReadInstrument(
                     if new_line:
                         # skip the stratocore serial keepalive messages
                         if new_line != b'\n':
-                            # if the line contains a '<', it is a Zephyr message
-                            if (-1 != new_line.find(b'<')):
+                            # if the line contains a '<', it is a Zephyr message.
+                            # Classify the raw bytes, and only decode once the handler is known.
+                            if b'<' in new_line:
                                 HandleZephyrMessage(str(new_line,'ascii'))
                             # otherwise, it is a log message
                             else:
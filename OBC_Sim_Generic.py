@@ -16,7 +16,6 @@ Command line usage:
 import sys
 import serial # import Serial Library
 import xml.etree.ElementTree as ET #import XML library
-from xml.dom import minidom
 from datetime import datetime
 from time import sleep
 
@@ -31,6 +30,13 @@ def GetTime() -> tuple:
     return curr_time, milliseconds
 
 
+def GetTimeString() -> str:
+    # create the '[HH:MM:SS.mmm] ' prefix used for log and display messages
+    curr_time, milliseconds = GetTime()
+
+    return f'[{curr_time}.{milliseconds}] '
+
+
 def crc16_ccitt(crc: int, data: bytes) -> int:
     msb = crc >> 8
     lsb = crc & 255
@@ -49,11 +55,22 @@ def AddCRC(InputXMLString: str) -> str:
     return InputXMLString + '<CRC>' + str(crc) + '</CRC>\n'
 
 
+def FlattenXML(xml_string: str) -> str:
+    # join a pretty-printed message into a single line for display
+    return ''.join(line.strip() for line in xml_string.splitlines())
+
+
 def prettify(xmlStr: ET.Element) -> str:
+    # indent in place rather than serializing and reparsing with minidom.
+    # The CRC is taken over this text, so it must match what minidom wrote:
+    # empty elements as <Tag/>, " in text escaped, and line breaks normalized
+    # to \n by the reparse. ElementTree escapes > in text, and the messages
+    # have no attributes, so the replaces only touch markup and text.
     INDENT = "\t"
-    rough_string = ET.tostring(xmlStr)
-    reparsed = minidom.parseString(rough_string)
-    return reparsed.toprettyxml(indent=INDENT)
+    ET.indent(xmlStr, space=INDENT)
+    xml_text = ET.tostring(xmlStr, encoding='unicode')
+    xml_text = xml_text.replace(' />', '/>').replace('"', '&quot;').replace('\r\n', '\n').replace('\r', '\n')
+    return '<?xml version="1.0" ?>\n' + xml_text + '\n'
 
 
 def sendIM(instrument: str, InstrumentMode: str, filename: str, port: serial.Serial) -> str:
@@ -78,8 +95,7 @@ def sendIM(instrument: str, InstrumentMode: str, filename: str, port: serial.Ser
 
     port.write(output.encode())
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)
@@ -134,8 +150,7 @@ def sendGPS(zenith: float, filename: str, port: serial.Serial) -> str:
 
     port.write(output.encode())
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)
@@ -172,8 +187,7 @@ def sendTC(instrument: str, command: str, filename: str, port: serial.Serial) ->
     port.write(crc.to_bytes(2,byteorder='big',signed=False))
     port.write(b'END')
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)
@@ -203,8 +217,7 @@ def sendSAck(instrument: str, ACK: str, filename: str, port: serial.Serial) -> s
 
     port.write(output.encode())
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)
@@ -234,8 +247,7 @@ def sendRAAck(instrument: str, ACK: str, filename: str, port: serial.Serial) ->
 
     port.write(output.encode())
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)
@@ -265,8 +277,7 @@ def sendTMAck(instrument: str, ACK: str, filename: str, port: serial.Serial) ->
 
     port.write(output.encode())
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)
@@ -293,8 +304,7 @@ def sendSW(instrument: str, filename: str, port: serial.Serial) -> str:
 
     port.write(output.encode())
 
-    time, millis = GetTime()
-    timestring = '[' + time + '.' + millis + '] '
+    timestring = GetTimeString()
 
     with open(filename, mode='a') as output_file:
         output_file.write(timestring)